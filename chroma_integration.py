@@ -1,66 +1,363 @@
 import chromadb
 from chromadb.config import Settings
-from langchain_community.embeddings import HuggingFaceEmbeddings  
+from langchain_community.embeddings import HuggingFaceEmbeddings
 import os
+import json
+import threading
+from content_store import ContentStore
 from utils import print_error
 
+CHROMA_PATH = ".chromadb"
+STATE_FILE = os.path.join(CHROMA_PATH, "repo_state.json")
+CONTENT_PATH = os.path.join(CHROMA_PATH, "content")
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+UNIFIED_COLLECTION = "all_repositories"
+BATCH_SIZE = 500
+PREVIEW_LINES = 20
+
+def record_id(repo_name, path):
+    # GitHub repository names cannot contain "/", so ids stay unique in the shared collection
+    return f"{repo_name}/{path}"
+
+def _optional_documents(documents):
+    # Records backed by the content store carry no document text
+    if not documents or all(doc is None for doc in documents):
+        return None
+    return [doc or "" for doc in documents]
+
 class ChromaManager:
-    def __init__(self):
+    def __init__(self, unified=None):
         self.client = chromadb.PersistentClient(
-            path=".chromadb",
+            path=CHROMA_PATH,
             settings=Settings(
                 anonymized_telemetry=False,
                 allow_reset=True
             )
         )
         self.embedding_function = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-MiniLM-L6-v2",
-            model_kwargs={'device': 'cpu'},  
+            model_name=EMBEDDING_MODEL,
+            model_kwargs={'device': 'cpu'},
             encode_kwargs={'normalize_embeddings': False}
         )
-    
+        # Without an explicit choice, use the unified layout once a migration has moved
+        # every per-repo collection into it; an interrupted one leaves both in place
+        if unified is None:
+            unified = self._collection_names() == [UNIFIED_COLLECTION]
+        self.unified = unified
+        self._state_lock = threading.Lock()
+        # Held by every writer that replaces a repository's records, so a background
+        # re-index never interleaves with a foreground index, import or migration
+        self.index_lock = threading.RLock()
+        # Content hashes of replaced or deleted records, checked by the next collect_garbage
+        self._released_hashes = set()
+        self.content_store = ContentStore(CONTENT_PATH)
+        self._backfill_registry()
+
+    def _collection_names(self):
+        return [col.name for col in self.client.list_collections()]
+
+    def _repo_collection_names(self):
+        return [name for name in self._collection_names() if name != UNIFIED_COLLECTION]
+
+    def _repo_source(self, repo_name):
+        # Repositories already moved by an unfinished migration live in the unified collection
+        if self.unified or repo_name not in self._collection_names():
+            return self.client.get_collection(UNIFIED_COLLECTION), {"repo": repo_name}
+        return self.client.get_collection(repo_name), None
+
+    def _unified_collection(self):
+        return self.client.get_or_create_collection(UNIFIED_COLLECTION)
+
     def store_documents(self, repo_name, documents, metadatas, ids):
-        collection = self.client.get_or_create_collection(repo_name)
+        # Replace rather than add, so re-indexing picks up changed files
+        with self.index_lock:
+            self.delete_repo(repo_name)
+            self.add_documents(repo_name, documents, metadatas, ids)
+            self.collect_garbage()
+
+    def add_documents(self, repo_name, documents, metadatas, ids):
         embeddings = self.embedding_function.embed_documents(documents)
 
-        collection.add(
-            documents=documents,
-            metadatas=metadatas,
-            ids=ids,
-            embeddings=embeddings
+        # Chroma keeps only a pointer into the shared content store, not the file text
+        metadatas = [
+            {
+                **meta,
+                "content_hash": self.content_store.put(doc),
+                "start_line": 1,
+                "end_line": max(1, len(doc.splitlines()))
+            }
+            for doc, meta in zip(documents, metadatas)
+        ]
+        self.add_records(repo_name, ids, None, metadatas, embeddings)
+
+    def read_text(self, document, metadata, max_lines=None):
+        # Raises OSError, ValueError or RuntimeError when stored content cannot be read
+        if "content_hash" not in metadata:
+            return document or ""
+
+        start_line = metadata.get("start_line", 1)
+        end_line = metadata.get("end_line")
+        if max_lines is not None:
+            end_line = min(end_line or start_line + max_lines - 1, start_line + max_lines - 1)
+        return self.content_store.read_lines(metadata["content_hash"], start_line, end_line)
+
+    def document_text(self, document, metadata, max_lines=None):
+        try:
+            return self.read_text(document, metadata, max_lines)
+        except (OSError, ValueError, RuntimeError) as e:
+            # A missing, corrupt or undecodable blob costs one preview, not the whole search
+            return f"[preview unavailable: {str(e)}]"
+
+    def _release(self, metadatas):
+        self._released_hashes.update(
+            meta["content_hash"] for meta in metadatas if meta and "content_hash" in meta
         )
-    
+
+    def collect_garbage(self):
+        # Only content that replaced or deleted records pointed at is checked, so the cost
+        # follows the change rather than the size of the index. Writers hold the index lock
+        # between storing content and adding its records, so none is in between
+        with self.index_lock:
+            candidates = list(self._released_hashes)
+            if self.unified:
+                collections = [self._unified_collection()]
+            else:
+                collections = self.client.list_collections()
+
+            referenced = set()
+            for start in range(0, len(candidates), BATCH_SIZE):
+                chunk = candidates[start:start + BATCH_SIZE]
+                for collection in collections:
+                    metadatas = collection.get(
+                        where={"content_hash": {"$in": chunk}},
+                        include=["metadatas"]
+                    )['metadatas']
+                    referenced.update(meta["content_hash"] for meta in metadatas)
+
+            removed = 0
+            for digest in candidates:
+                if digest in referenced:
+                    self._released_hashes.discard(digest)
+                elif self.content_store.discard(digest):
+                    self._released_hashes.discard(digest)
+                    removed += 1
+                # Blobs kept for their grace period are checked again by a later run
+            return removed
+
+    def repo_texts(self, repo_name):
+        # Local corpus for offline text search, read back from the content store. Unreadable
+        # content raises rather than being searched as a placeholder
+        for batch in self.iter_repo_records(repo_name, include=["documents", "metadatas"]):
+            for doc, meta in zip(batch['documents'], batch['metadatas']):
+                yield meta['path'], self.read_text(doc, meta)
+
     def search_repo(self, repo_name, query, n_results=5):
         try:
-            collection = self.client.get_collection(repo_name)
-            
             query_embedding = self.embedding_function.embed_query(query)
-            
+            collection, where = self._repo_source(repo_name)
+
             results = collection.query(
                 query_embeddings=[query_embedding],
-                n_results=n_results
+                n_results=n_results,
+                where=where
             )
             return results
         except Exception as e:
             print_error(f"Search failed: {str(e)}")
             return None
-    
+
     def search_all(self, query, n_results=5):
-        results = {}
-        
+        # Globally ranked (repo, path, preview text, distance) tuples, nearest first
+        hits = []
+
         query_embedding = self.embedding_function.embed_query(query)
-        
-        for collection in self.client.list_collections():
+
+        if self.unified:
+            collections = [self.client.get_collection(UNIFIED_COLLECTION)]
+        else:
+            collections = self.client.list_collections()
+
+        for collection in collections:
             try:
                 query_result = collection.query(
                     query_embeddings=[query_embedding],
-                    n_results=n_results
+                    n_results=n_results,
+                    include=["documents", "metadatas", "distances"]
                 )
-                if query_result['documents'][0]:
-                    results[collection.name] = query_result
             except Exception:
                 continue
-        return results
-    
+
+            for doc, meta, distance in zip(
+                query_result['documents'][0],
+                query_result['metadatas'][0],
+                query_result['distances'][0]
+            ):
+                hits.append((meta.get('repo', collection.name), meta['path'], doc, meta, distance))
+
+        hits.sort(key=lambda hit: hit[4])
+        # During an unfinished migration a repository can be in both layouts; keep its best hit
+        best_hits, seen = [], set()
+        for hit in hits:
+            if (hit[0], hit[1]) not in seen:
+                seen.add((hit[0], hit[1]))
+                best_hits.append(hit)
+        hits = best_hits
+        # Previews are only read from the content store for the hits actually returned
+        return [
+            (repo_name, path, self.document_text(doc, meta, max_lines=PREVIEW_LINES), distance)
+            for repo_name, path, doc, meta, distance in hits[:n_results]
+        ]
+
+    def _backfill_registry(self):
+        # Unified indexes built before the registry existed are scanned once to fill it in
+        if UNIFIED_COLLECTION not in self._collection_names():
+            return
+        if any(state.get("indexed") for state in self.load_repo_states().values()):
+            return
+        metadatas = self._unified_collection().get(include=["metadatas"])['metadatas']
+        for repo_name in {meta['repo'] for meta in metadatas}:
+            self._register_repo(repo_name)
+
+    def _register_repo(self, repo_name, indexed=True):
+        if self.get_repo_state(repo_name).get("indexed", False) != indexed:
+            self.record_repo_state(repo_name, indexed=indexed)
+
     def list_indexed_repos(self):
-        return [col.name for col in self.client.list_collections()]
\ No newline at end of file
+        # Repository names come from the small state registry, never from scanning records
+        repo_names = {
+            repo_name for repo_name, state in self.load_repo_states().items()
+            if state.get("indexed")
+        }
+        if not self.unified:
+            repo_names.update(self._repo_collection_names())
+        return sorted(repo_names)
+
+    def migrate_to_unified(self):
+        # Stored embeddings are copied as-is, so nothing is re-embedded. Each repository is
+        # cleared from the unified collection before copying, so an interrupted run can resume
+        with self.index_lock:
+            unified = self._unified_collection()
+            migrated = 0
+
+            for name in self._repo_collection_names():
+                collection = self.client.get_collection(name)
+                unified.delete(where={"repo": name})
+                offset = 0
+                while True:
+                    batch = collection.get(
+                        include=["documents", "metadatas", "embeddings"],
+                        limit=BATCH_SIZE,
+                        offset=offset
+                    )
+                    if not batch['ids']:
+                        break
+
+                    unified.add(
+                        ids=[record_id(name, meta['path']) for meta in batch['metadatas']],
+                        documents=_optional_documents(batch['documents']),
+                        metadatas=[{**meta, "repo": name} for meta in batch['metadatas']],
+                        embeddings=batch['embeddings']
+                    )
+                    offset += len(batch['ids'])
+
+                self._register_repo(name)
+                self.client.delete_collection(name)
+                migrated += 1
+
+            self.unified = True
+            return migrated
+
+    def iter_repo_records(self, repo_name, batch_size=BATCH_SIZE,
+                          include=("documents", "metadatas", "embeddings")):
+        collection, where = self._repo_source(repo_name)
+
+        offset = 0
+        while True:
+            batch = collection.get(
+                where=where,
+                include=list(include),
+                limit=batch_size,
+                offset=offset
+            )
+            if not batch['ids']:
+                return
+            yield batch
+            offset += len(batch['ids'])
+
+    def delete_repo(self, repo_name):
+        names = self._collection_names()
+        if UNIFIED_COLLECTION in names:
+            unified = self._unified_collection()
+            self._release(unified.get(where={"repo": repo_name}, include=["metadatas"])['metadatas'])
+            unified.delete(where={"repo": repo_name})
+        if not self.unified and repo_name in names:
+            self._release(self.client.get_collection(repo_name).get(include=["metadatas"])['metadatas'])
+            self.client.delete_collection(repo_name)
+        # The recorded source no longer describes what is stored, even if reloading fails
+        self.forget_repo_state(repo_name)
+
+    def prune_repo(self, repo_name, keep_ids, keep_paths=()):
+        # Deletes the repository's records whose id is not in keep_ids, except those for
+        # keep_paths; also drops records still under older id schemes
+        collection, _ = self._repo_source(repo_name)
+        stale = [
+            (stored_id, meta)
+            for batch in self.iter_repo_records(repo_name, include=["metadatas"])
+            for stored_id, meta in zip(batch['ids'], batch['metadatas'])
+            if stored_id not in keep_ids and meta['path'] not in keep_paths
+        ]
+        if stale:
+            collection.delete(ids=[stored_id for stored_id, _ in stale])
+            self._release(meta for _, meta in stale)
+        return len(stale)
+
+    def add_records(self, repo_name, ids, documents, metadatas, embeddings):
+        # Bulk insert of precomputed embeddings, nothing is re-embedded
+        if self.unified:
+            collection = self._unified_collection()
+            # Older "<repo>_<path>" ids can collide across repositories, so rebuild them
+            ids = [record_id(repo_name, meta['path']) for meta in metadatas]
+        else:
+            collection = self.client.get_or_create_collection(repo_name)
+
+        # Upserted, so re-indexing replaces a file's record where it stands
+        self._release(collection.get(ids=ids, include=["metadatas"])['metadatas'])
+        collection.upsert(
+            ids=ids,
+            documents=_optional_documents(documents),
+            metadatas=[{**meta, "repo": repo_name} for meta in metadatas],
+            embeddings=embeddings
+        )
+        self._register_repo(repo_name)
+
+    def load_repo_states(self):
+        if not os.path.exists(STATE_FILE):
+            return {}
+        try:
+            with open(STATE_FILE, "r") as f:
+                return json.load(f)
+        except json.JSONDecodeError:
+            return {}
+
+    def get_repo_state(self, repo_name):
+        return self.load_repo_states().get(repo_name, {})
+
+    def _write_repo_states(self, states):
+        os.makedirs(os.path.dirname(STATE_FILE), exist_ok=True)
+        temp_path = f"{STATE_FILE}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(states, f, indent=4)
+        os.replace(temp_path, STATE_FILE)
+
+    def record_repo_state(self, repo_name, **state):
+        # The freshness scheduler records state from its own thread
+        with self._state_lock:
+            states = self.load_repo_states()
+            states[repo_name] = {**states.get(repo_name, {}), **state}
+            self._write_repo_states(states)
+
+    def forget_repo_state(self, repo_name):
+        with self._state_lock:
+            states = self.load_repo_states()
+            if states.pop(repo_name, None) is not None:
+                self._write_repo_states(states)
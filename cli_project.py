@@ -1,12 +1,16 @@
 import os
 import time
+import threading
 from rich.console import Console
 from rich.table import Table
 from rich import box
 from rich.progress import Progress
 from github_auth import authenticate_github
-from repo_browser import TEXT_EXTENSIONS, fetch_user_repos, display_repo_tree, index_repository
+from repo_browser import (TEXT_EXTENSIONS, TREE_MAX_DEPTH, fetch_user_repos, display_repo_tree,
+                          index_repository, clear_tree_cache)
 from chroma_integration import ChromaManager
+from snapshot import export_snapshot, import_snapshot
+from freshness import FreshnessScheduler, index_status
 from utils import (print_success, print_error, print_warning, display_header)
 
 class RepoManagerCLI:
@@ -17,6 +21,8 @@ class RepoManagerCLI:
         self.repos = []
         self.user = None
         self.session = None  
+        self.idle = threading.Event()
+        self.scheduler = None
     
     def run(self):
         try:
@@ -27,6 +33,8 @@ class RepoManagerCLI:
                     
                 self.github = self.session['github']
                 self.user = self.github.get_user()
+                self.scheduler = FreshnessScheduler(self.chroma, self.github, idle=self.idle)
+                self.scheduler.start()
                 self.main_menu()
                 self._clear_session()
 
@@ -63,8 +71,11 @@ class RepoManagerCLI:
                 ("3", "Index repository"),
                 ("4", "Basic text search"),
                 ("5", "Semantic search"),
-                ("6", "[yellow]Logout[/yellow]"),
-                ("7", "[red]Exit[/red]")
+                ("6", "Migrate index to unified collection"),
+                ("7", "Export index snapshot"),
+                ("8", "Import index snapshot"),
+                ("9", "[yellow]Logout[/yellow]"),
+                ("10", "[red]Exit[/red]")
             ]
             
             for item in menu_items:
@@ -72,7 +83,12 @@ class RepoManagerCLI:
             
             self.console.print(menu_table)
             
-            choice = input("\nSelect an option: ").strip()
+            # Stale indexes are refreshed in the background only while waiting here
+            self.idle.set()
+            try:
+                choice = input("\nSelect an option: ").strip()
+            finally:
+                self.idle.clear()
             
             if choice == "1":
                 self.list_repositories()
@@ -85,14 +101,29 @@ class RepoManagerCLI:
             elif choice == "5":
                 self.search_indexed_repositories()
             elif choice == "6":
+                self.migrate_index()
+            elif choice == "7":
+                self.export_snapshot()
+            elif choice == "8":
+                self.import_snapshot()
+            elif choice == "9":
                 self.logout()
                 return  
-            elif choice == "7":
+            elif choice == "10":
+                # Stop the scheduler first so no background write is cut off mid-way
+                self._clear_session()
                 print_success("\nGoodbye!\n")
                 raise SystemExit(0)
             else:
                 print_warning("Invalid choice, please try again")
 
+    def _clear_session(self):
+        self.session = None
+        if self.scheduler:
+            self.scheduler.stop()
+            self.scheduler = None
+        clear_tree_cache()
+
     def logout(self):
         print_success(f"\nLogged out {self.user.login} successfully!")
         self.session['authenticated'] = False
@@ -112,11 +143,17 @@ class RepoManagerCLI:
         table = Table(box=box.ROUNDED, show_header=True, header_style="bold magenta")
         table.add_column("#", style="cyan", width=4)
         table.add_column("Repository", style="bold green" , width=60)
+        table.add_column("Index", width=12)
         
+        indexed_repos = set(self.chroma.list_indexed_repos())
+        states = self.chroma.load_repo_states()
+        status_styles = {"fresh": "green", "stale": "yellow", "unknown": "magenta", "not indexed": "dim"}
         for idx, repo in enumerate(self.repos, 1):
+            status = index_status(repo, indexed_repos, states)
             table.add_row(
                 str(idx),
-                repo.name
+                repo.name,
+                f"[{status_styles[status]}]{status}"
             )
         
         self.console.print(table)
@@ -131,11 +168,16 @@ class RepoManagerCLI:
                 return
             
             repo = self.repos[repo_idx]
+            max_depth = self._prompt_positive_int("\nDepth limit", TREE_MAX_DEPTH)
             display_header(f"\nRepository Structure: {repo.name}")
             
             try:
-                tree = display_repo_tree(repo)
-                self.console.print(tree)
+                display_repo_tree(repo, max_depth=max_depth, console=self.console)
+                while True:
+                    path = input("\nDirectory to expand (blank to return): ").strip().strip("/")
+                    if not path:
+                        break
+                    display_repo_tree(repo, path=path, max_depth=max_depth, console=self.console)
             except Exception as e:
                 print_error(f"Failed to display repository structure: {str(e)}")
                 input("\nPress Enter to return to menu...")
@@ -146,6 +188,26 @@ class RepoManagerCLI:
             input("\nPress Enter to return to menu...")
             return
     
+    def _matching_preview(self, file_content, query):
+        if query.lower() not in file_content.lower():
+            return None
+        lines = file_content.split('\n')
+        matching_lines = [
+            f"Line {i+1}: {line.strip()}" 
+            for i, line in enumerate(lines) 
+            if query.lower() in line.lower()
+        ]
+        return "\n".join(matching_lines[:3])
+
+    def _search_local_contents(self, repo_name, query):
+        # Fresh indexes are searched in the local content store instead of over the API
+        matches = []
+        for path, file_content in self.chroma.repo_texts(repo_name):
+            preview = self._matching_preview(file_content, query)
+            if preview is not None:
+                matches.append((path, preview))
+        return matches
+
     def _search_repo_contents(self, repo, query):
         matches = []
         
@@ -159,14 +221,8 @@ class RepoManagerCLI:
                         if ext.lower() in TEXT_EXTENSIONS:
                             try:
                                 file_content = content.decoded_content.decode('utf-8')
-                                if query.lower() in file_content.lower():
-                                    lines = file_content.split('\n')
-                                    matching_lines = [
-                                        f"Line {i+1}: {line.strip()}" 
-                                        for i, line in enumerate(lines) 
-                                        if query.lower() in line.lower()
-                                    ]
-                                    preview = "\n".join(matching_lines[:3])  
+                                preview = self._matching_preview(file_content, query)
+                                if preview is not None:
                                     matches.append((content.path, preview))
                             except UnicodeDecodeError:
                                 continue
@@ -206,7 +262,66 @@ class RepoManagerCLI:
         finally:
             input("\nPress Enter to return to menu...")
 
-    def _display_search_results_table(self, results, search_type="Basic"):
+    def migrate_index(self):
+        display_header("\nMigrate Index to Unified Collection")
+        if self.chroma.unified:
+            print_warning("Index already uses the unified collection")
+            return
+
+        try:
+            migrated = self.chroma.migrate_to_unified()
+            print_success(f"Migrated {migrated} repositories into the unified collection")
+        except Exception as e:
+            print_error(f"Migration failed: {str(e)}")
+            print_warning("Run the migration again to resume it")
+
+    def export_snapshot(self):
+        display_header("\nExport Index Snapshot")
+        indexed_repos = self.chroma.list_indexed_repos()
+        if not indexed_repos:
+            print_warning("No indexed repositories found. Please index repositories first.")
+            return
+
+        for idx, repo_name in enumerate(indexed_repos, 1):
+            print(f"{idx}. {repo_name}")
+
+        choice = input(f"\nRepository to export (1-{len(indexed_repos)}, 'a' for all, 'b' to back): ").strip().lower()
+        if choice == 'b':
+            return
+        if choice == 'a':
+            repo_names = indexed_repos
+        else:
+            try:
+                idx = int(choice) - 1
+            except ValueError:
+                print_warning("Please enter a valid number")
+                return
+            if not 0 <= idx < len(indexed_repos):
+                print_warning(f"Please enter a number between 1 and {len(indexed_repos)}")
+                return
+            repo_names = [indexed_repos[idx]]
+
+        path = input("Snapshot file (default index_snapshot.jsonl.gz): ").strip() or "index_snapshot.jsonl.gz"
+        try:
+            counts = export_snapshot(self.chroma, path, repo_names)
+            print_success(f"Exported {sum(counts.values())} records from {len(counts)} repositories to {path}")
+        except Exception as e:
+            print_error(f"Export failed: {str(e)}")
+
+    def import_snapshot(self):
+        display_header("\nImport Index Snapshot")
+        path = input("Snapshot file: ").strip()
+        if not path or not os.path.exists(path):
+            print_warning("Please enter the path of an existing snapshot file")
+            return
+
+        try:
+            counts = import_snapshot(self.chroma, path)
+            print_success(f"Imported {sum(counts.values())} records for {len(counts)} repositories")
+        except Exception as e:
+            print_error(f"Import failed: {str(e)}")
+
+    def _display_search_results_table(self, results, search_type="Basic", scored=False):
         table = Table(
             title=f"{search_type} Search Results",
             box=box.ROUNDED,
@@ -215,33 +330,43 @@ class RepoManagerCLI:
         )
         
         table.add_column("#", style="cyan", width=4)
+        if scored:
+            table.add_column("Score", style="yellow", width=7)
         table.add_column("Repository", style="green", width=25)
         table.add_column("File Path", width=40)
         table.add_column("Preview", width=60)
         
-        for idx, (repo_name, file_path, preview) in enumerate(results, 1):
-            table.add_row(
-                str(idx),
-                repo_name,
-                file_path,
-                preview
-            )
+        for idx, result in enumerate(results, 1):
+            if scored:
+                repo_name, file_path, preview, score = result
+                table.add_row(str(idx), f"{score:.3f}", repo_name, file_path, preview)
+            else:
+                repo_name, file_path, preview = result
+                table.add_row(
+                    str(idx),
+                    repo_name,
+                    file_path,
+                    preview
+                )
         
         self.console.print(table)
 
-    def _get_preview_count(self):
+    def _prompt_positive_int(self, prompt, default):
         while True:
             try:
-                count = input("\nNumber of results to display (default 5): ").strip()
-                if not count:
-                    return 5
-                count = int(count)
-                if count > 0:
-                    return count
+                value = input(f"{prompt} (default {default}): ").strip()
+                if not value:
+                    return default
+                value = int(value)
+                if value > 0:
+                    return value
                 print_warning("Please enter a positive number")
             except ValueError:
                 print_warning("Please enter a valid number")
 
+    def _get_preview_count(self):
+        return self._prompt_positive_int("\nNumber of results to display", 5)
+
     def search_all_repositories_basic(self):
         if not self.repos:
             self.repos = fetch_user_repos(self.github)
@@ -255,6 +380,8 @@ class RepoManagerCLI:
         preview_count = self._get_preview_count()
         found_results = False
         all_results = []
+        indexed_repos = set(self.chroma.list_indexed_repos())
+        states = self.chroma.load_repo_states()
         
         with Progress() as progress:
             task = progress.add_task("Searching all repositories...", total=len(self.repos))
@@ -263,7 +390,14 @@ class RepoManagerCLI:
                 progress.update(task, advance=1, description=f"Searching {repo.name[:20]}...")
                 
                 try:
-                    matches = self._search_repo_contents(repo, query)
+                    if index_status(repo, indexed_repos, states) == "fresh":
+                        try:
+                            matches = self._search_local_contents(repo.name, query)
+                        except (OSError, ValueError, RuntimeError) as e:
+                            print_warning(f"Local copy of {repo.name} is unreadable, searching GitHub instead: {str(e)}")
+                            matches = self._search_repo_contents(repo, query)
+                    else:
+                        matches = self._search_repo_contents(repo, query)
                     if matches:
                         found_results = True
                         for path, preview in matches[:preview_count]:  
@@ -300,16 +434,17 @@ class RepoManagerCLI:
             print_warning("No results found in any indexed repository")
             return
         
+        # Results arrive nearest first; map L2 distance to a (0, 1] score, higher is better
         all_results = []
-        for repo_name, result in results.items():
-            for doc, meta in zip(result['documents'][0], result['metadatas'][0]):
-                all_results.append((
-                    repo_name,
-                    meta['path'],
-                    f"{doc[:200]}{'...' if len(doc) > 200 else ''}"
-                ))
+        for repo_name, path, doc, distance in results:
+            all_results.append((
+                repo_name,
+                path,
+                f"{doc[:200]}{'...' if len(doc) > 200 else ''}",
+                1 / (1 + distance)
+            ))
         
-        self._display_search_results_table(all_results, "Semantic")
+        self._display_search_results_table(all_results, "Semantic", scored=True)
 
     def _select_repository(self, prompt):
         if not self.repos:
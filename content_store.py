@@ -0,0 +1,158 @@
+import os
+import time
+import struct
+import tempfile
+import threading
+import zlib
+import hashlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+MAGIC = b"CSB1"
+CODEC_ZLIB = 0
+CODEC_ZSTD = 1
+FRAME_LINES = 200
+GC_GRACE_PERIOD = 60 * 60
+
+# Blob layout: MAGIC, codec byte, frame count, then frame_count + 1 offsets, then frames.
+# Each frame holds FRAME_LINES lines compressed on its own, so a line range is read by
+# seeking to and decompressing only the frames that cover it.
+_HEADER = struct.Struct("<4sBI")
+_OFFSET = struct.Struct("<Q")
+
+def content_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+def _compress(codec, data):
+    if codec == CODEC_ZSTD:
+        return zstandard.ZstdCompressor().compress(data)
+    return zlib.compress(data, 6)
+
+def _decompress(codec, data):
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("Content blob is zstd-compressed but the zstandard package is not installed")
+        try:
+            return zstandard.ZstdDecompressor().decompress(data)
+        except zstandard.ZstdError as e:
+            raise ValueError(f"Corrupt content frame: {str(e)}")
+    try:
+        return zlib.decompress(data)
+    except zlib.error as e:
+        raise ValueError(f"Corrupt content frame: {str(e)}")
+
+class ContentStore:
+    def __init__(self, path, grace_period=GC_GRACE_PERIOD):
+        self.path = path
+        self.codec = CODEC_ZSTD if zstandard is not None else CODEC_ZLIB
+        # Blobs written or reused this recently may belong to records another process
+        # (the freshness daemon next to the CLI) has not added yet, so they are never discarded
+        self.grace_period = grace_period
+
+    def _blob_path(self, digest):
+        return os.path.join(self.path, digest[:2], digest[2:])
+
+    def contains(self, digest):
+        return os.path.exists(self._blob_path(digest))
+
+    def put(self, text):
+        # Keyed by content, so identical files in any repository or fork are stored once
+        digest = content_hash(text)
+        blob_path = self._blob_path(digest)
+        if os.path.exists(blob_path):
+            try:
+                # Reusing a blob restarts its grace period
+                os.utime(blob_path)
+                return digest
+            except FileNotFoundError:
+                pass
+
+        lines = text.splitlines(keepends=True)
+        frames = [
+            _compress(self.codec, "".join(lines[i:i + FRAME_LINES]).encode('utf-8'))
+            for i in range(0, len(lines), FRAME_LINES)
+        ]
+
+        offset = _HEADER.size + _OFFSET.size * (len(frames) + 1)
+        offsets = [offset]
+        for frame in frames:
+            offset += len(frame)
+            offsets.append(offset)
+
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        # A unique temporary file per writer, so threads storing the same content never collide
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(blob_path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(_HEADER.pack(MAGIC, self.codec, len(frames)))
+                for value in offsets:
+                    f.write(_OFFSET.pack(value))
+                for frame in frames:
+                    f.write(frame)
+            os.replace(temp_path, blob_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return digest
+
+    def read_lines(self, digest, start_line=1, end_line=None):
+        # 1-based, inclusive line range; end_line=None reads to the end of the file
+        with open(self._blob_path(digest), "rb") as f:
+            header = f.read(_HEADER.size)
+            if len(header) != _HEADER.size:
+                raise ValueError(f"Corrupt content blob: {digest}")
+            magic, codec, frame_count = _HEADER.unpack(header)
+            if magic != MAGIC:
+                raise ValueError(f"Corrupt content blob: {digest}")
+            if frame_count == 0:
+                return ""
+
+            last_frame = frame_count - 1
+            if end_line is not None:
+                last_frame = min(last_frame, (end_line - 1) // FRAME_LINES)
+            first_frame = (start_line - 1) // FRAME_LINES
+            if first_frame > last_frame:
+                return ""
+
+            f.seek(_HEADER.size + _OFFSET.size * first_frame)
+            offsets = [
+                _OFFSET.unpack(f.read(_OFFSET.size))[0]
+                for _ in range(last_frame - first_frame + 2)
+            ]
+            f.seek(offsets[0])
+            data = f.read(offsets[-1] - offsets[0])
+
+        text = "".join(
+            _decompress(codec, data[start - offsets[0]:end - offsets[0]]).decode('utf-8')
+            for start, end in zip(offsets, offsets[1:])
+        )
+        lines = text.splitlines(keepends=True)
+        skip = start_line - 1 - first_frame * FRAME_LINES
+        if end_line is None:
+            return "".join(lines[skip:])
+        return "".join(lines[skip:end_line - first_frame * FRAME_LINES])
+
+    def read(self, digest):
+        return self.read_lines(digest)
+
+    def discard(self, digest):
+        # Returns whether the blob is gone; one still within its grace period is kept.
+        # It is moved aside before its age is checked, so a put() racing with this either
+        # refreshes it first or finds it missing and writes it again
+        blob_path = self._blob_path(digest)
+        trash_path = f"{blob_path}.{os.getpid()}.{threading.get_ident()}.gc"
+        try:
+            os.replace(blob_path, trash_path)
+        except FileNotFoundError:
+            return True
+
+        if time.time() - os.path.getmtime(trash_path) < self.grace_period:
+            # Content-addressed, so this is identical to anything written in the meantime
+            os.replace(trash_path, blob_path)
+            return False
+        os.remove(trash_path)
+        return True
@@ -0,0 +1,34 @@
+import asyncio
+import base64
+import os
+from concurrent.futures import ThreadPoolExecutor
+from github_client import configured_pool_size
+
+def fetch_concurrency():
+    # Never exceed the per-host connection pool, or urllib3 discards the extra connections
+    concurrency = int(os.environ.get("GITHUB_FETCH_CONCURRENCY", configured_pool_size()))
+    return max(1, min(concurrency, configured_pool_size()))
+
+async def _fetch_blob(repo, path, sha, semaphore, executor):
+    async with semaphore:
+        try:
+            loop = asyncio.get_running_loop()
+            blob = await loop.run_in_executor(executor, repo.get_git_blob, sha)
+            return path, base64.b64decode(blob.content), None
+        except Exception as e:
+            return path, None, e
+
+async def _fetch_blobs(repo, files, on_blob, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        tasks = [
+            asyncio.create_task(_fetch_blob(repo, path, sha, semaphore, executor))
+            for path, sha in files
+        ]
+        for next_done in asyncio.as_completed(tasks):
+            on_blob(*await next_done)
+
+def fetch_blobs(repo, files, on_blob, concurrency=None):
+    # Downloads (path, blob sha) pairs in parallel and calls on_blob(path, data, error)
+    # for each one as soon as it arrives; exactly one of data and error is None.
+    asyncio.run(_fetch_blobs(repo, files, on_blob, concurrency or fetch_concurrency()))
@@ -0,0 +1,184 @@
+import os
+import time
+import threading
+from chroma_integration import ChromaManager
+from github_client import get_github_client
+from repo_browser import index_repository
+from utils import print_error, print_info, print_success
+
+DEFAULT_INTERVAL = 15 * 60
+DEFAULT_RATE_LIMIT_RESERVE = 1000
+DEFAULT_MAX_REINDEX = 3
+DEFAULT_CPU_BUDGET = 0.25
+MAX_FAILURE_BACKOFF = 24 * 60 * 60
+STOP_TIMEOUT = 60
+
+def index_status(repo, indexed_repos, states):
+    # Compares against the pushed_at GitHub already returns with the repository list,
+    # so showing staleness costs no extra API requests
+    if repo.name not in indexed_repos:
+        return "not indexed"
+
+    state = states.get(repo.name, {})
+    if state.get("incomplete"):
+        return "stale"
+    if not state.get("commit") or not state.get("pushed_at"):
+        return "unknown"
+
+    pushed_at = repo.pushed_at.isoformat() if repo.pushed_at else None
+    return "fresh" if state["pushed_at"] == pushed_at else "stale"
+
+class FreshnessScheduler:
+    def __init__(self, chroma_manager, github, idle=None, interval=None,
+                 rate_limit_reserve=None, max_reindex=None, cpu_budget=None):
+        self.chroma = chroma_manager
+        self.github = github
+        # Without an idle signal (the daemon) the scheduler is always free to run
+        self.idle = idle
+        if self.idle is None:
+            self.idle = threading.Event()
+            self.idle.set()
+
+        self.interval = interval or int(os.environ.get("FRESHNESS_INTERVAL", DEFAULT_INTERVAL))
+        self.rate_limit_reserve = rate_limit_reserve or int(
+            os.environ.get("FRESHNESS_RATE_LIMIT_RESERVE", DEFAULT_RATE_LIMIT_RESERVE))
+        self.max_reindex = max_reindex or int(os.environ.get("FRESHNESS_MAX_REINDEX", DEFAULT_MAX_REINDEX))
+        self.cpu_budget = cpu_budget or float(os.environ.get("FRESHNESS_CPU_BUDGET", DEFAULT_CPU_BUDGET))
+
+        # Repository name -> (consecutive failures, time before which it is skipped)
+        self._failures = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="freshness-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=STOP_TIMEOUT):
+        # Waits for an in-flight re-index to notice and give up, so nothing keeps
+        # running on the GitHub client of a session that has ended
+        self._stop.set()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_cycle()
+            except Exception:
+                # A failed cycle is retried on the next interval; never surface it over the menu
+                pass
+            self._stop.wait(self.interval)
+
+    def _wait_for_idle(self):
+        while not self.idle.wait(1):
+            if self._stop.is_set():
+                return False
+        return not self._stop.is_set()
+
+    def _interrupted(self):
+        # Checked between files, so a re-index gives way as soon as the user is back
+        return self._stop.is_set() or not self.idle.is_set()
+
+    def _within_api_budget(self):
+        # Read from the last response's headers, so checking costs no request
+        remaining, _ = self.github.rate_limiting
+        return remaining < 0 or remaining >= self.rate_limit_reserve
+
+    def stale_repos(self):
+        indexed_repos = set(self.chroma.list_indexed_repos())
+        states = self.chroma.load_repo_states()
+        stale, unknown = [], []
+
+        for repo in self.github.get_user().get_repos():
+            status = index_status(repo, indexed_repos, states)
+            if status == "stale":
+                stale.append(repo)
+            elif status == "unknown":
+                unknown.append(repo)
+
+        # Repositories that have gone longest without an index update come first, starting
+        # with incomplete ones; indexes with no recorded source follow every stale one
+        stale.sort(key=lambda repo: states[repo.name].get("pushed_at") or "")
+        return stale + unknown
+
+    def _backing_off(self, repo_name):
+        failures = self._failures.get(repo_name)
+        return failures is not None and time.time() < failures[1]
+
+    def _record_failure(self, repo_name):
+        # Repositories that keep failing wait twice as long after each failure
+        count = self._failures.get(repo_name, (0, 0))[0] + 1
+        delay = min(self.interval * 2 ** (count - 1), MAX_FAILURE_BACKOFF)
+        self._failures[repo_name] = (count, time.time() + delay)
+
+    def run_cycle(self):
+        reindexed = []
+        attempts = 0
+
+        for repo in self.stale_repos():
+            if self._backing_off(repo.name):
+                continue
+            # Every repository looked at costs API requests, so head checks count too
+            if attempts >= self.max_reindex or not self._wait_for_idle():
+                break
+            if not self._within_api_budget():
+                break
+            attempts += 1
+
+            state = self.chroma.get_repo_state(repo.name)
+            try:
+                commit = repo.get_branch(repo.default_branch).commit.sha
+            except Exception:
+                self._record_failure(repo.name)
+                continue
+            if commit == state.get("commit"):
+                # Pushed to another branch only; the index still matches the default branch
+                with self.chroma.index_lock:
+                    if self.chroma.get_repo_state(repo.name).get("commit") == commit:
+                        self.chroma.record_repo_state(
+                            repo.name,
+                            pushed_at=repo.pushed_at.isoformat() if repo.pushed_at else None
+                        )
+                self._failures.pop(repo.name, None)
+                continue
+
+            started = time.time()
+            if index_repository(repo, self.chroma, quiet=True, interrupted=self._interrupted) and \
+                    not self.chroma.get_repo_state(repo.name).get("incomplete"):
+                reindexed.append(repo.name)
+                self._failures.pop(repo.name, None)
+            elif self._interrupted():
+                # Giving way to the user is not a failure; the next cycle picks it up again
+                break
+            else:
+                self._record_failure(repo.name)
+
+            # Rest in proportion to the work done to stay within the CPU budget
+            elapsed = time.time() - started
+            if self._stop.wait(elapsed * (1 - self.cpu_budget) / self.cpu_budget):
+                break
+
+        return reindexed
+
+def main():
+    token = os.environ.get("GITHUB_TOKEN")
+    if not token:
+        print_error("Set GITHUB_TOKEN to run the freshness daemon")
+        return
+
+    scheduler = FreshnessScheduler(ChromaManager(), get_github_client(token))
+    print_info(f"Checking indexed repositories every {scheduler.interval}s (Ctrl+C to stop)")
+    try:
+        while True:
+            for repo_name in scheduler.run_cycle():
+                print_success(f"Re-indexed {repo_name}")
+            time.sleep(scheduler.interval)
+    except KeyboardInterrupt:
+        print_info("\nFreshness daemon stopped")
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,7 @@ import json
 import stat
 import bcrypt
 from github import Github
+from github_client import get_github_client
 from getpass import getpass
 from utils import print_error, print_success, print_warning, print_info, display_header
 from rich.console import Console
@@ -168,7 +169,7 @@ def handle_existing_user() -> Github:
             if not token:
                 raise ValueError("Invalid credentials")
             
-            gh = Github(token)
+            gh = get_github_client(token)
             user = gh.get_user()
             if not hasattr(user, 'login'):
                 raise ValueError("Invalid GitHub response")
@@ -200,7 +201,7 @@ def handle_new_user() -> Github:
         username = input("Enter your username: ").strip()
         token = getpass("Enter yourGitHub personal access token: ")
         
-        gh = Github(token)
+        gh = get_github_client(token)
         user = gh.get_user()
         if not hasattr(user, 'login'):
             raise ValueError("Invalid GitHub token")
@@ -0,0 +1,155 @@
+import os
+import json
+import time
+import threading
+from github import Github, GithubException, RateLimitExceededException
+from urllib3.util.retry import Retry
+
+DEFAULT_BASE_URL = "https://api.github.com"
+DEFAULT_POOL_SIZE = 10
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_BACKOFF_FACTOR = 1.0
+DEFAULT_BACKOFF_MAX = 60
+DEFAULT_SECONDARY_RATE_WAIT = 60
+DEFAULT_MAX_RATE_LIMIT_WAIT = 60
+RETRY_STATUSES = (403, 429, 500, 502, 503, 504)
+
+class RetryStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.retries = 0
+        self.wait_time = 0.0
+
+    def record(self, wait):
+        with self._lock:
+            self.retries += 1
+            self.wait_time += wait
+
+    def reset(self):
+        with self._lock:
+            self.retries = 0
+            self.wait_time = 0.0
+
+retry_stats = RetryStats()
+
+class BackoffRetry(Retry):
+    # Retries 5xx and rate-limited 403/429 responses with jittered exponential backoff,
+    # waiting out Retry-After or X-RateLimit-Reset when the server provides them, and
+    # secondary_rate_wait for secondary rate limits recognised only from the body.
+    # A wait longer than max_rate_limit_wait is raised instead of slept through.
+    def __init__(self, stats=None, secondary_rate_wait=DEFAULT_SECONDARY_RATE_WAIT,
+                 max_rate_limit_wait=DEFAULT_MAX_RATE_LIMIT_WAIT, **kwargs):
+        super().__init__(**kwargs)
+        self.stats = stats or retry_stats
+        self.secondary_rate_wait = secondary_rate_wait
+        self.max_rate_limit_wait = max_rate_limit_wait
+        self.requested_wait = None
+
+    def new(self, **kw):
+        retry = super().new(**kw)
+        retry.stats = self.stats
+        retry.secondary_rate_wait = self.secondary_rate_wait
+        retry.max_rate_limit_wait = self.max_rate_limit_wait
+        return retry
+
+    @staticmethod
+    def response_data(response):
+        try:
+            return json.loads(response.data or b"{}")
+        except ValueError:
+            return {"message": response.reason}
+
+    def server_wait(self, response):
+        # Seconds the server asked us to wait, or None when it did not ask
+        retry_after = super().get_retry_after(response)
+        if retry_after is not None:
+            return retry_after
+
+        reset = response.headers.get("X-RateLimit-Reset")
+        if response.headers.get("X-RateLimit-Remaining") == "0" and reset:
+            try:
+                return max(0.0, float(reset) - time.time()) + 1
+            except ValueError:
+                pass
+
+        # Secondary rate limits often carry neither header, only a message in the body
+        if response.status in (403, 429):
+            message = str(self.response_data(response).get("message", "")).lower()
+            if "rate limit" in message or "abuse" in message:
+                return self.secondary_rate_wait
+        return None
+
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        wait = self.server_wait(response) if response is not None else None
+
+        # A 403 that is not a rate limit is a real permission error
+        if response is not None and response.status == 403 and wait is None:
+            raise GithubException(response.status, self.response_data(response), response.headers)
+        if wait is not None and wait > self.max_rate_limit_wait:
+            # Callers report this like any other failed request instead of freezing for an hour
+            raise RateLimitExceededException(
+                response.status,
+                {"message": f"Rate limited for {wait:.0f}s, longer than the {self.max_rate_limit_wait:.0f}s allowed"},
+                response.headers
+            )
+
+        retry = super().increment(method, url, response, error, _pool, _stacktrace)
+        retry.requested_wait = wait
+        return retry
+
+    def sleep(self, response=None):
+        wait = self.requested_wait if self.respect_retry_after_header else None
+        if wait is None:
+            wait = self.get_backoff_time()
+
+        self.stats.record(wait)
+        if wait > 0:
+            time.sleep(wait)
+
+def build_retry(max_retries=None, backoff_factor=None, stats=None, secondary_rate_wait=None,
+                max_rate_limit_wait=None):
+    if max_retries is None:
+        max_retries = int(os.environ.get("GITHUB_MAX_RETRIES", DEFAULT_MAX_RETRIES))
+    if backoff_factor is None:
+        backoff_factor = float(os.environ.get("GITHUB_BACKOFF_FACTOR", DEFAULT_BACKOFF_FACTOR))
+    if secondary_rate_wait is None:
+        secondary_rate_wait = float(os.environ.get("GITHUB_SECONDARY_RATE_WAIT", DEFAULT_SECONDARY_RATE_WAIT))
+    if max_rate_limit_wait is None:
+        max_rate_limit_wait = float(os.environ.get("GITHUB_MAX_RATE_LIMIT_WAIT", DEFAULT_MAX_RATE_LIMIT_WAIT))
+
+    return BackoffRetry(
+        stats=stats,
+        secondary_rate_wait=secondary_rate_wait,
+        max_rate_limit_wait=max_rate_limit_wait,
+        total=max_retries,
+        backoff_factor=backoff_factor,
+        backoff_max=DEFAULT_BACKOFF_MAX,
+        backoff_jitter=backoff_factor,
+        status_forcelist=RETRY_STATUSES,
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+
+def configured_pool_size():
+    return int(os.environ.get("GITHUB_POOL_SIZE", DEFAULT_POOL_SIZE))
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+def get_github_client(token, base_url=None, pool_size=None, retry=None):
+    # One keep-alive connection pool per token and API endpoint, shared by every caller
+    if base_url is None:
+        base_url = os.environ.get("GITHUB_API_URL", DEFAULT_BASE_URL)
+    if pool_size is None:
+        pool_size = configured_pool_size()
+
+    key = (token, base_url)
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = Github(
+                token,
+                base_url=base_url,
+                retry=retry or build_retry(),
+                pool_size=pool_size
+            )
+        return _clients[key]
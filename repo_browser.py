@@ -2,17 +2,38 @@ from github import GithubException
 from rich.table import Table
 from rich.tree import Tree
 from rich import box
-from rich.progress import Progress
+from rich.progress import Progress, MofNCompleteColumn
+from rich.live import Live
 import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from rich.console import Console
 from rich import box
 from datetime import datetime
 from utils import print_error, print_info, print_success, print_warning
+from github_client import retry_stats
+from fetch_engine import fetch_blobs
+from chroma_integration import record_id
 
 TEXT_EXTENSIONS = {
     '.py', '.md', '.txt', '.rst', '.json', '.yaml', '.yml', '.html', '.css', '.js',
     '.java', '.c', '.cpp', '.h', '.sh', '.go'  }
 
+TREE_MAX_DEPTH = 2
+TREE_MAX_ENTRIES = 50
+TREE_PREFETCH_WORKERS = 4
+TREE_PREFETCH_LIMIT = 16
+INDEX_BATCH_SIZE = 64
+
+# Directory listings keyed by (repo full name, path), kept for the session. Clearing the
+# cache starts a new generation so listings still in flight for the old one are dropped.
+_tree_cache = {}
+_tree_pending = {}
+_tree_generation = 0
+_tree_lock = threading.Lock()
+_prefetch_pool = ThreadPoolExecutor(max_workers=TREE_PREFETCH_WORKERS)
+
 def fetch_user_repos(github, descending=True):
     try:
         user = github.get_user()
@@ -52,97 +73,283 @@ def display_repos_table(repos, title="My Repositories"):
         print_error(f"Failed to display repositories table: {str(e)}")
         raise 
 
-def display_repo_tree(repo):
+def _fetch_directory(repo, path, generation):
+    contents = repo.get_contents(path)
+    if not isinstance(contents, list):
+        contents = [contents]
+    # Directories first so collapsed tails of huge directories are mostly files
+    entries = sorted(
+        ((content.name, content.path, content.type) for content in contents),
+        key=lambda entry: (entry[2] != "dir", entry[0].lower())
+    )
+    with _tree_lock:
+        if generation == _tree_generation:
+            _tree_cache[(repo.full_name, path)] = entries
+    return entries
+
+def _prefetch_done(key, future):
+    with _tree_lock:
+        if _tree_pending.get(key) is future:
+            del _tree_pending[key]
+
+def prefetch_directory(repo, path):
+    key = (repo.full_name, path)
+    with _tree_lock:
+        if key in _tree_cache or key in _tree_pending:
+            return False
+        future = _prefetch_pool.submit(_fetch_directory, repo, path, _tree_generation)
+        _tree_pending[key] = future
+    future.add_done_callback(lambda done: _prefetch_done(key, done))
+    return True
+
+def list_directory(repo, path=""):
+    key = (repo.full_name, path)
+    with _tree_lock:
+        entries = _tree_cache.get(key)
+        future = _tree_pending.get(key)
+        generation = _tree_generation
+    if entries is not None:
+        return entries
+    # Only wait on a prefetch that is already running; a queued one is cancelled so
+    # an on-demand request never sits behind the background queue
+    if future is not None and not future.cancel():
+        return future.result()
+    return _fetch_directory(repo, path, generation)
+
+def clear_tree_cache():
+    global _tree_generation
+    with _tree_lock:
+        _tree_generation += 1
+        pending = list(_tree_pending.values())
+        _tree_pending.clear()
+        _tree_cache.clear()
+    # Cancelling runs the done callbacks, which take the lock themselves
+    for future in pending:
+        future.cancel()
+
+def display_repo_tree(repo, path="", max_depth=TREE_MAX_DEPTH, console=None):
+    console = console or Console()
     try:
-        tree = Tree(f"[bold]{repo.name}")
+        tree = Tree(f"[bold]{repo.name}/{path}" if path else f"[bold]{repo.name}")
         
-        def build_tree(node, path=""):
-            try:
-                contents = repo.get_contents(path)
-                for content in contents:
-                    if content.type == "dir":
-                        branch = node.add(f"[yellow]{content.name}")
-                        build_tree(branch, content.path)
+        # Breadth-first so the top levels appear first while deeper ones load
+        prefetch_budget = TREE_PREFETCH_LIMIT
+        with Live(tree, console=console, transient=True, refresh_per_second=8):
+            queue = deque([(tree, path, 1)])
+            while queue:
+                node, dir_path, depth = queue.popleft()
+                try:
+                    entries = list_directory(repo, dir_path)
+                except GithubException as e:
+                    node.add(f"[red]Error loading {dir_path}: {str(e)}")
+                    continue
+                except Exception as e:
+                    node.add(f"[red]Unexpected error: {str(e)}")
+                    continue
+
+                for name, entry_path, entry_type in entries[:TREE_MAX_ENTRIES]:
+                    if entry_type == "dir":
+                        if depth < max_depth:
+                            prefetch_directory(repo, entry_path)
+                            queue.append((node.add(f"[yellow]{name}"), entry_path, depth + 1))
+                        else:
+                            # A few directories past the depth limit are fetched ahead for on-demand expansion
+                            if prefetch_budget > 0 and prefetch_directory(repo, entry_path):
+                                prefetch_budget -= 1
+                            node.add(f"[yellow]{name}/ [dim]...")
                     else:
-                        node.add(f"[cyan]{content.name}")
-            except GithubException as e:
-                node.add(f"[red]Error loading {path}: {str(e)}")
-            except Exception as e:
-                node.add(f"[red]Unexpected error: {str(e)}")
-        
-        build_tree(tree)
+                        node.add(f"[cyan]{name}")
+
+                hidden = len(entries) - TREE_MAX_ENTRIES
+                if hidden > 0:
+                    node.add(f"[dim]{hidden} more files")
+
+        console.print(tree)
         return tree
         
     except Exception as e:
         print_error(f"Failed to generate repository tree: {str(e)}")
         error_tree = Tree(f"[red]Error displaying {repo.name}")
         error_tree.add(f"[yellow]{str(e)}")
+        console.print(error_tree)
         return error_tree
 
-def index_repository(repo, chroma_manager):
+class IndexingInterrupted(Exception):
+    pass
+
+def _silent(message):
+    pass
+
+def _list_indexable_files(repo, ref, show_warning=print_warning):
+    # (path, blob sha) of every text file, from one recursive tree request when possible
+    tree = repo.get_git_tree(ref, recursive=True)
+    if not tree.raw_data.get("truncated"):
+        files = [(entry.path, entry.sha) for entry in tree.tree if entry.type == "blob"]
+        return [f for f in files if os.path.splitext(f[0])[1].lower() in TEXT_EXTENSIONS], 0
+
+    # Trees too large for a single response are walked directory by directory
+    files = []
+    error_count = 0
+
+    def walk(path=""):
+        nonlocal error_count
+        try:
+            for content in repo.get_contents(path, ref=ref):
+                if content.type == "dir":
+                    walk(content.path)
+                elif os.path.splitext(content.path)[1].lower() in TEXT_EXTENSIONS:
+                    files.append((content.path, content.sha))
+        except GithubException as e:
+            show_warning(f"Error accessing {path}: {str(e)}")
+            error_count += 1
+
+    walk()
+    return files, error_count
+
+def index_repository(repo, chroma_manager, quiet=False, interrupted=None):
+    # Background re-indexing runs quietly so nothing is drawn over the menu prompt
+    if quiet:
+        show_info = show_success = show_warning = show_error = _silent
+    else:
+        show_info, show_success, show_warning, show_error = print_info, print_success, print_warning, print_error
+    
     try:
-        print_info(f"Indexing repository: {repo.name}")
+        show_info(f"Indexing repository: {repo.name}")
         
         documents = []
         metadatas = []
         ids = []
-        error_count = 0
+        indexed_count = 0
+        store_error = None
+        interrupted_at = None
+        stored_ids = set()
+        failed_paths = set()
+        retries_before, wait_before = retry_stats.retries, retry_stats.wait_time
         
-        def process_contents(contents, path=""):
-            nonlocal error_count
-            try:
-                for content in contents:
-                    try:
-                        if content.type == "dir":
-                            process_contents(repo.get_contents(content.path), content.path)
-                        else:
-                            _, ext = os.path.splitext(content.path)
-                            if ext.lower() in TEXT_EXTENSIONS:
-                                try:
-                                    file_content = content.decoded_content.decode('utf-8')
-                                    documents.append(file_content)
-                                    metadatas.append({
-                                        "path": content.path,
-                                        "repo": repo.name,
-                                        "type": "file",
-                                        "extension": ext
-                                    })
-                                    ids.append(f"{repo.name}_{content.path}")
-                                except UnicodeDecodeError:
-                                    print_warning(f"Skipping binary file: {content.path}")
-                                except Exception as e:
-                                    print_warning(f"Error processing {content.path}: {str(e)}")
-                                    error_count += 1
-                    except GithubException as e:
-                        print_warning(f"Error accessing {content.path if hasattr(content, 'path') else path}: {str(e)}")
+        try:
+            # Pin one commit so the tree, the blobs and the recorded source all agree
+            commit = repo.get_branch(repo.default_branch).commit.sha
+            files, error_count = _list_indexable_files(repo, commit, show_warning)
+            listing_errors = error_count
+        except Exception as e:
+            show_error(f"Failed to access repository contents: {str(e)}")
+            return False
+        
+        # Writers hold the index lock so foreground and background indexing never interleave
+        with chroma_manager.index_lock:
+            with Progress(*Progress.get_default_columns(), MofNCompleteColumn(), disable=quiet) as progress:
+                task = progress.add_task(f"Indexing {repo.name}...", total=len(files))
+            
+                def store_batch():
+                    # Files are embedded and stored in batches while the rest are still downloading
+                    nonlocal indexed_count, store_error
+                    if documents and store_error is None:
+                        try:
+                            # New records replace old ones in place, so searches keep seeing a
+                            # whole index even if this run stops partway
+                            chroma_manager.add_documents(repo.name, documents, metadatas, ids)
+                            stored_ids.update(ids)
+                            indexed_count += len(documents)
+                        except Exception as e:
+                            store_error = e
+                    documents.clear()
+                    metadatas.clear()
+                    ids.clear()
+            
+                def process_blob(path, data, error):
+                    nonlocal error_count
+                    if interrupted is not None and interrupted():
+                        raise IndexingInterrupted()
+                    progress.advance(task)
+                    if isinstance(error, GithubException):
+                        show_warning(f"Error accessing {path}: {str(error)}")
                         error_count += 1
-            except Exception as e:
-                print_error(f"Error processing directory {path}: {str(e)}")
-                error_count += 1
+                        failed_paths.add(path)
+                        return
+                    if error is not None:
+                        show_warning(f"Error processing {path}: {str(error)}")
+                        error_count += 1
+                        failed_paths.add(path)
+                        return
+                
+                    try:
+                        file_content = data.decode('utf-8')
+                    except UnicodeDecodeError:
+                        show_warning(f"Skipping binary file: {path}")
+                        return
+                
+                    _, ext = os.path.splitext(path)
+                    documents.append(file_content)
+                    metadatas.append({
+                        "path": path,
+                        "repo": repo.name,
+                        "type": "file",
+                        "extension": ext
+                    })
+                    ids.append(record_id(repo.name, path))
+                    if len(documents) >= INDEX_BATCH_SIZE:
+                        store_batch()
+            
+                try:
+                    fetch_blobs(repo, files, process_blob)
+                except IndexingInterrupted:
+                    interrupted_at = indexed_count
+                else:
+                    store_batch()
+            
+            if interrupted_at is None and store_error is None and indexed_count and not listing_errors:
+                # Files gone from the repository are only dropped once every remaining one
+                # is stored; files that failed to download keep their previous version
+                try:
+                    chroma_manager.prune_repo(repo.name, stored_ids, failed_paths)
+                except Exception as e:
+                    store_error = e
+        
+            if indexed_count:
+                # Content only the replaced records pointed at is no longer needed
+                try:
+                    chroma_manager.collect_garbage()
+                except Exception as e:
+                    show_warning(f"Failed to clean up unused file contents: {str(e)}")
+        
+            retries = retry_stats.retries - retries_before
+            if retries:
+                show_info(f"Retried {retries} GitHub requests, waited {retry_stats.wait_time - wait_before:.1f}s")
         
-        with Progress() as progress:
-            task = progress.add_task(f"Indexing {repo.name}...", total=1)
-            try:
-                process_contents(repo.get_contents(""))
-            except Exception as e:
-                print_error(f"Failed to access repository contents: {str(e)}")
+            if interrupted_at is not None:
+                # The old records are all still there, so the recorded state stays as it was
+                show_warning(f"Indexing of {repo.name} was interrupted")
+                return False
+            
+            if store_error is not None:
+                if indexed_count:
+                    chroma_manager.record_repo_state(repo.name, incomplete=True)
+                show_error(f"Failed to store documents in ChromaDB: {str(store_error)}")
                 return False
-            progress.update(task, completed=1)
         
-        if documents:
-            try:
-                chroma_manager.store_documents(repo.name, documents, metadatas, ids)
-                print_success(f"Indexed {len(documents)} files from {repo.name}")
-                if error_count > 0:
-                    print_warning(f"Encountered {error_count} errors during indexing")
-                return True
-            except Exception as e:
-                print_error(f"Failed to store documents in ChromaDB: {str(e)}")
+            if indexed_count:
+                try:
+                    if error_count == 0:
+                        chroma_manager.record_repo_state(
+                            repo.name,
+                            commit=commit,
+                            pushed_at=repo.pushed_at.isoformat() if repo.pushed_at else None,
+                            incomplete=False
+                        )
+                    else:
+                        # Files that failed to load are missing, so the index must not read as fresh
+                        chroma_manager.record_repo_state(repo.name, incomplete=True)
+                    show_success(f"Indexed {indexed_count} files from {repo.name}")
+                    if error_count > 0:
+                        show_warning(f"Encountered {error_count} errors during indexing")
+                    return True
+                except Exception as e:
+                    show_error(f"Failed to record index state: {str(e)}")
+                    return False
+            else:
+                show_warning(f"No indexable files found in {repo.name}")
                 return False
-        else:
-            print_warning(f"No indexable files found in {repo.name}")
-            return False
             
     except Exception as e:
-        print_error(f"Unexpected error during indexing: {str(e)}")
+        show_error(f"Unexpected error during indexing: {str(e)}")
         return False
\ No newline at end of file
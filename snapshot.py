@@ -0,0 +1,155 @@
+import os
+import sys
+import json
+import gzip
+import base64
+import time
+from array import array
+from chroma_integration import ChromaManager, EMBEDDING_MODEL
+from utils import print_error, print_info, print_success
+
+SNAPSHOT_FORMAT = "repo-index-snapshot"
+SNAPSHOT_VERSION = 2
+SUPPORTED_VERSIONS = (1, 2)
+
+# A snapshot is gzip-compressed JSON Lines: one header line, then for each repository
+# a "repo" line followed by "records" lines holding at most one batch each, so both
+# export and import stream batch by batch instead of loading everything into memory.
+# Since version 2 a "records" line also carries the content-store text of every file
+# it references that no earlier line in the snapshot has carried.
+
+def _encode_embeddings(embeddings):
+    return [base64.b64encode(array('f', embedding).tobytes()).decode('ascii') for embedding in embeddings]
+
+def _decode_embeddings(encoded):
+    embeddings = []
+    for value in encoded:
+        embedding = array('f')
+        embedding.frombytes(base64.b64decode(value))
+        embeddings.append(embedding.tolist())
+    return embeddings
+
+def _write_line(f, record):
+    f.write(json.dumps(record))
+    f.write("\n")
+
+def export_snapshot(chroma_manager, path, repo_names=None):
+    repo_names = repo_names or chroma_manager.list_indexed_repos()
+    temp_path = f"{path}.tmp"
+    counts = {}
+    written_hashes = set()
+
+    try:
+        with gzip.open(temp_path, "wt", encoding="utf-8") as f:
+            _write_line(f, {
+                "format": SNAPSHOT_FORMAT,
+                "version": SNAPSHOT_VERSION,
+                "model": EMBEDDING_MODEL,
+                "created": time.time()
+            })
+
+            for repo_name in repo_names:
+                state = chroma_manager.get_repo_state(repo_name)
+                _write_line(f, {
+                    "type": "repo",
+                    "name": repo_name,
+                    "commit": state.get("commit"),
+                    "pushed_at": state.get("pushed_at")
+                })
+
+                counts[repo_name] = 0
+                for batch in chroma_manager.iter_repo_records(repo_name):
+                    contents = {}
+                    for meta in batch['metadatas']:
+                        digest = meta.get("content_hash")
+                        if digest and digest not in written_hashes:
+                            contents[digest] = chroma_manager.content_store.read(digest)
+                            written_hashes.add(digest)
+
+                    _write_line(f, {
+                        "type": "records",
+                        "ids": batch['ids'],
+                        "documents": batch['documents'],
+                        "metadatas": batch['metadatas'],
+                        "embeddings": _encode_embeddings(batch['embeddings']),
+                        "contents": contents
+                    })
+                    counts[repo_name] += len(batch['ids'])
+
+        os.replace(temp_path, path)
+        return counts
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+def import_snapshot(chroma_manager, path):
+    counts = {}
+
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        header = json.loads(f.readline() or "{}")
+        if header.get("format") != SNAPSHOT_FORMAT:
+            raise ValueError("Not an index snapshot file")
+        if header.get("version") not in SUPPORTED_VERSIONS:
+            raise ValueError(f"Unsupported snapshot version: {header.get('version')}")
+        if header.get("model") != EMBEDDING_MODEL:
+            raise ValueError(
+                f"Snapshot was built with {header.get('model')}, but this index uses {EMBEDDING_MODEL}"
+            )
+
+        with chroma_manager.index_lock:
+            # delete_repo forgets the old source, and the snapshot's commit is only recorded
+            # once all of the repository's records are in, so a failed import reads as unknown
+            repo_name = source = None
+            for line in f:
+                record = json.loads(line)
+                if record["type"] == "repo":
+                    if repo_name is not None:
+                        chroma_manager.record_repo_state(repo_name, **source)
+                    repo_name = record["name"]
+                    source = {"commit": record.get("commit"), "pushed_at": record.get("pushed_at")}
+                    chroma_manager.delete_repo(repo_name)
+                    counts[repo_name] = 0
+                elif record["type"] == "records":
+                    for text in record.get("contents", {}).values():
+                        chroma_manager.content_store.put(text)
+                    chroma_manager.add_records(
+                        repo_name,
+                        record["ids"],
+                        record["documents"],
+                        record["metadatas"],
+                        _decode_embeddings(record["embeddings"])
+                    )
+                    counts[repo_name] += len(record["ids"])
+
+            if repo_name is not None:
+                chroma_manager.record_repo_state(repo_name, **source)
+            # Content of the replaced records is only dropped once the import has succeeded
+            chroma_manager.collect_garbage()
+
+    return counts
+
+USAGE = "Usage: python snapshot.py export PATH [REPO ...] | python snapshot.py import PATH"
+
+def main(argv=None):
+    # Headless entry point for CI runners: works on the local index, no GitHub login needed
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) < 2 or argv[0] not in ("export", "import"):
+        print_info(USAGE)
+        return 2
+
+    command, path, repo_names = argv[0], argv[1], argv[2:]
+    try:
+        chroma_manager = ChromaManager()
+        if command == "export":
+            counts = export_snapshot(chroma_manager, path, repo_names or None)
+            print_success(f"Exported {sum(counts.values())} records from {len(counts)} repositories to {path}")
+        else:
+            counts = import_snapshot(chroma_manager, path)
+            print_success(f"Imported {sum(counts.values())} records for {len(counts)} repositories")
+    except Exception as e:
+        print_error(f"{command.capitalize()} failed: {str(e)}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+import os
+import random
+import tempfile
+import unittest
+from content_store import ContentStore, FRAME_LINES, content_hash
+
+def expected_lines(text, start_line, end_line):
+    lines = text.splitlines(keepends=True)
+    return "".join(lines[start_line - 1:end_line])
+
+class ContentStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.store = ContentStore(self.temp_dir.name)
+        rng = random.Random(7)
+        endings = ["\n", "\r\n"]
+        # Several frames with a short last one, mixed line endings and no final newline
+        self.text = "".join(
+            f"line {i} {'x' * rng.randint(0, 40)}{rng.choice(endings)}"
+            for i in range(FRAME_LINES * 3 + 17)
+        ) + "tail without newline"
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_round_trip(self):
+        digest = self.store.put(self.text)
+
+        self.assertEqual(digest, content_hash(self.text))
+        self.assertTrue(self.store.contains(digest))
+        self.assertEqual(self.store.read(digest), self.text)
+
+    def test_identical_content_is_stored_once(self):
+        self.assertEqual(self.store.put(self.text), self.store.put(self.text))
+        blobs = [name for _, _, names in os.walk(self.temp_dir.name) for name in names]
+        self.assertEqual(len(blobs), 1)
+
+    def test_line_ranges(self):
+        digest = self.store.put(self.text)
+        line_count = len(self.text.splitlines())
+        ranges = [
+            (1, 1), (1, FRAME_LINES), (FRAME_LINES, FRAME_LINES + 1),
+            (FRAME_LINES + 1, FRAME_LINES * 2), (2, line_count), (line_count, line_count)
+        ]
+        rng = random.Random(11)
+        for _ in range(200):
+            start = rng.randint(1, line_count)
+            ranges.append((start, rng.randint(start, line_count + 5)))
+
+        for start, end in ranges:
+            with self.subTest(start=start, end=end):
+                self.assertEqual(self.store.read_lines(digest, start, end), expected_lines(self.text, start, end))
+
+    def test_open_ended_and_out_of_range_reads(self):
+        digest = self.store.put(self.text)
+        line_count = len(self.text.splitlines())
+
+        self.assertEqual(self.store.read_lines(digest, FRAME_LINES + 5), expected_lines(self.text, FRAME_LINES + 5, None))
+        self.assertEqual(self.store.read_lines(digest, line_count + 1), "")
+        self.assertEqual(self.store.read_lines(self.store.put(""), 1, 10), "")
+
+    def test_corrupt_blob_raises_value_error(self):
+        digest = self.store.put(self.text)
+        blob_path = self.store._blob_path(digest)
+        with open(blob_path, "rb") as f:
+            data = f.read()
+
+        with open(blob_path, "wb") as f:
+            f.write(data[:3])
+        with self.assertRaises(ValueError):
+            self.store.read(digest)
+
+        with open(blob_path, "wb") as f:
+            f.write(data[:-10] + b"0123456789")
+        with self.assertRaises(ValueError):
+            self.store.read_lines(digest, FRAME_LINES * 3, FRAME_LINES * 3 + 17)
+
+    def test_discard_respects_grace_period(self):
+        digest = self.store.put(self.text)
+
+        self.assertFalse(self.store.discard(digest))
+        self.assertTrue(self.store.contains(digest))
+
+        self.store.grace_period = 0
+        self.assertTrue(self.store.discard(digest))
+        self.assertFalse(self.store.contains(digest))
+        self.assertTrue(self.store.discard(digest))
+
+if __name__ == "__main__":
+    unittest.main()
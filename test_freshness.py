@@ -0,0 +1,38 @@
+import unittest
+from datetime import datetime
+from types import SimpleNamespace
+from freshness import index_status
+
+PUSHED_AT = datetime(2026, 1, 2, 3, 4, 5)
+
+def repo(name="alpha", pushed_at=PUSHED_AT):
+    return SimpleNamespace(name=name, pushed_at=pushed_at)
+
+class IndexStatusTest(unittest.TestCase):
+    def test_not_indexed(self):
+        self.assertEqual(index_status(repo(), {"beta"}, {}), "not indexed")
+
+    def test_unknown_without_recorded_source(self):
+        self.assertEqual(index_status(repo(), {"alpha"}, {}), "unknown")
+        self.assertEqual(index_status(repo(), {"alpha"}, {"alpha": {"indexed": True}}), "unknown")
+        self.assertEqual(
+            index_status(repo(), {"alpha"}, {"alpha": {"commit": "abc", "pushed_at": None}}),
+            "unknown"
+        )
+
+    def test_fresh_when_pushed_at_matches(self):
+        states = {"alpha": {"commit": "abc", "pushed_at": PUSHED_AT.isoformat()}}
+        self.assertEqual(index_status(repo(), {"alpha"}, states), "fresh")
+
+    def test_stale_after_a_newer_push(self):
+        states = {"alpha": {"commit": "abc", "pushed_at": datetime(2026, 1, 1).isoformat()}}
+        self.assertEqual(index_status(repo(), {"alpha"}, states), "stale")
+        self.assertEqual(index_status(repo(pushed_at=None), {"alpha"}, states), "stale")
+
+    def test_incomplete_index_is_stale(self):
+        states = {"alpha": {"commit": "abc", "pushed_at": PUSHED_AT.isoformat(), "incomplete": True}}
+        self.assertEqual(index_status(repo(), {"alpha"}, states), "stale")
+        self.assertEqual(index_status(repo(), {"alpha"}, {"alpha": {"incomplete": True}}), "stale")
+
+if __name__ == "__main__":
+    unittest.main()
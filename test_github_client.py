@@ -0,0 +1,105 @@
+import json
+import time
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from github import GithubException, RateLimitExceededException
+from github_client import RetryStats, build_retry, get_github_client
+
+USER = {"login": "octocat", "id": 1}
+
+class StandInHandler(BaseHTTPRequestHandler):
+    # Serves the server's scripted (status, headers) responses in order, then 200s
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        status, headers, *message = self.server.script.pop(0) if self.server.script else (200, {})
+        body = json.dumps(USER if status == 200 else {"message": message[0] if message else "injected"}).encode()
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+class BackoffRetryTest(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+        self.server.requests = []
+        self.server.script = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+        self.stats = RetryStats()
+        self.github = get_github_client(
+            f"token-{self.id()}",
+            base_url=f"http://127.0.0.1:{self.server.server_port}",
+            retry=build_retry(max_retries=3, backoff_factor=0.01, stats=self.stats,
+                              secondary_rate_wait=0.5, max_rate_limit_wait=5)
+        )
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_server_error_is_retried_and_counted(self):
+        self.server.script = [(502, {})]
+
+        self.assertEqual(self.github.get_user().login, "octocat")
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertEqual(self.stats.retries, 1)
+
+    def test_rate_limited_403_waits_for_reset(self):
+        reset = int(time.time()) + 1
+        self.server.script = [(403, {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": str(reset)})]
+
+        self.assertEqual(self.github.get_user().login, "octocat")
+        self.assertGreaterEqual(time.time(), reset)
+        self.assertEqual(self.stats.retries, 1)
+        self.assertGreaterEqual(self.stats.wait_time, 1)
+
+    def test_403_with_retry_after_waits_given_time(self):
+        self.server.script = [(403, {"Retry-After": "1"})]
+
+        started = time.time()
+        self.assertEqual(self.github.get_user().login, "octocat")
+        self.assertGreaterEqual(time.time() - started, 1)
+        self.assertEqual(self.stats.retries, 1)
+        self.assertAlmostEqual(self.stats.wait_time, 1, places=1)
+
+    def test_wait_beyond_limit_is_raised_not_slept(self):
+        reset = int(time.time()) + 3600
+        self.server.script = [(403, {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": str(reset)})]
+
+        started = time.time()
+        with self.assertRaises(RateLimitExceededException):
+            self.github.get_user().login
+        self.assertLess(time.time() - started, 5)
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertEqual(self.stats.retries, 0)
+
+    def test_secondary_rate_limit_without_headers_is_retried(self):
+        self.server.script = [(403, {}, "You have exceeded a secondary rate limit. Please wait a few minutes.")]
+
+        self.assertEqual(self.github.get_user().login, "octocat")
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertEqual(self.stats.retries, 1)
+        self.assertAlmostEqual(self.stats.wait_time, 0.5)
+
+    def test_plain_403_is_not_retried(self):
+        self.server.script = [(403, {})]
+
+        with self.assertRaises(GithubException) as raised:
+            self.github.get_user().login
+        self.assertEqual(raised.exception.status, 403)
+        self.assertEqual(raised.exception.data["message"], "injected")
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertEqual(self.stats.retries, 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+import os
+import gzip
+import json
+import tempfile
+import threading
+import unittest
+from content_store import ContentStore
+from snapshot import export_snapshot, import_snapshot, SNAPSHOT_FORMAT
+from chroma_integration import EMBEDDING_MODEL
+
+class InMemoryIndex:
+    # Stands in for ChromaManager with just the calls snapshots make
+    def __init__(self, content_path):
+        self.content_store = ContentStore(content_path)
+        self.index_lock = threading.RLock()
+        self.records = {}
+        self.states = {}
+
+    def list_indexed_repos(self):
+        return sorted(self.records)
+
+    def get_repo_state(self, repo_name):
+        return self.states.get(repo_name, {})
+
+    def record_repo_state(self, repo_name, **state):
+        self.states[repo_name] = {**self.states.get(repo_name, {}), **state}
+
+    def delete_repo(self, repo_name):
+        self.records.pop(repo_name, None)
+        self.states.pop(repo_name, None)
+
+    def add_records(self, repo_name, ids, documents, metadatas, embeddings):
+        records = self.records.setdefault(repo_name, [])
+        documents = documents or [None] * len(ids)
+        records.extend(zip(ids, documents, metadatas, embeddings))
+
+    def iter_repo_records(self, repo_name, batch_size=2):
+        records = self.records.get(repo_name, [])
+        for start in range(0, len(records), batch_size):
+            ids, documents, metadatas, embeddings = zip(*records[start:start + batch_size])
+            yield {
+                "ids": list(ids),
+                "documents": list(documents),
+                "metadatas": list(metadatas),
+                "embeddings": list(embeddings)
+            }
+
+    def collect_garbage(self):
+        return 0
+
+class SnapshotTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, "snapshot.jsonl.gz")
+        self.source = InMemoryIndex(os.path.join(self.temp_dir.name, "source"))
+        self.target = InMemoryIndex(os.path.join(self.temp_dir.name, "target"))
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def add_files(self, index, repo_name, files):
+        metadatas, embeddings = [], []
+        for i, (path, text) in enumerate(files.items()):
+            metadatas.append({
+                "path": path,
+                "repo": repo_name,
+                "content_hash": index.content_store.put(text),
+                "start_line": 1,
+                "end_line": max(1, len(text.splitlines()))
+            })
+            embeddings.append([0.25 * i, -1.5, 3.0])
+        index.add_records(repo_name, [f"{repo_name}/{m['path']}" for m in metadatas], None, metadatas, embeddings)
+
+    def test_round_trip(self):
+        self.add_files(self.source, "alpha", {"a.py": "print(1)\n", "b.py": "x = 2\n", "c.md": "# shared\n"})
+        self.add_files(self.source, "beta", {"readme.md": "# shared\n"})
+        self.source.record_repo_state("alpha", commit="abc", pushed_at="2026-01-01T00:00:00")
+
+        self.assertEqual(export_snapshot(self.source, self.path), {"alpha": 3, "beta": 1})
+        self.assertEqual(import_snapshot(self.target, self.path), {"alpha": 3, "beta": 1})
+
+        self.assertEqual(self.target.records, self.source.records)
+        self.assertEqual(self.target.get_repo_state("alpha"), {"commit": "abc", "pushed_at": "2026-01-01T00:00:00"})
+        for records in self.target.records.values():
+            for _, _, meta, _ in records:
+                self.assertEqual(
+                    self.target.content_store.read(meta["content_hash"]),
+                    self.source.content_store.read(meta["content_hash"])
+                )
+
+    def test_shared_content_is_written_once(self):
+        self.add_files(self.source, "alpha", {"c.md": "# shared\n"})
+        self.add_files(self.source, "beta", {"readme.md": "# shared\n"})
+        export_snapshot(self.source, self.path)
+
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            lines = [json.loads(line) for line in f]
+        contents = [record["contents"] for record in lines if record.get("type") == "records"]
+        self.assertEqual([len(batch) for batch in contents], [1, 0])
+
+    def test_imports_version_1_snapshots(self):
+        # Version 1 kept the file text in the documents themselves
+        with gzip.open(self.path, "wt", encoding="utf-8") as f:
+            for record in [
+                {"format": SNAPSHOT_FORMAT, "version": 1, "model": EMBEDDING_MODEL, "created": 0},
+                {"type": "repo", "name": "legacy", "commit": "def", "pushed_at": None},
+                {
+                    "type": "records",
+                    "ids": ["legacy_a.py"],
+                    "documents": ["print('old')\n"],
+                    "metadatas": [{"path": "a.py", "repo": "legacy"}],
+                    "embeddings": ["AACAPw=="]
+                }
+            ]:
+                f.write(json.dumps(record) + "\n")
+
+        self.assertEqual(import_snapshot(self.target, self.path), {"legacy": 1})
+        self.assertEqual(
+            self.target.records["legacy"],
+            [("legacy_a.py", "print('old')\n", {"path": "a.py", "repo": "legacy"}, [1.0])]
+        )
+        self.assertEqual(self.target.get_repo_state("legacy"), {"commit": "def", "pushed_at": None})
+
+    def test_rejects_other_embedding_models(self):
+        with gzip.open(self.path, "wt", encoding="utf-8") as f:
+            f.write(json.dumps({"format": SNAPSHOT_FORMAT, "version": 2, "model": "other-model"}) + "\n")
+
+        with self.assertRaises(ValueError):
+            import_snapshot(self.target, self.path)
+        self.assertEqual(self.target.records, {})
+
+if __name__ == "__main__":
+    unittest.main()